@@ -1,5 +1,5 @@
 import os
-import errno
+from functools import lru_cache
 import pandas as pd
 import numpy as np
 
@@ -112,12 +112,7 @@ class CreationAlternative:
         self.alternative_name = self.get_alternative_name(self.dss_name,
                                                           type_series)
 
-        if not os.path.isdir(self.output_path):
-            try:
-                os.makedirs(self.output_path)
-            except OSError as e:
-                if e.errno != errno.EEXIST:
-                    raise
+        os.makedirs(self.output_path, exist_ok=True)
 
     @classmethod
     def get_alternative_name(cls,
@@ -127,11 +122,7 @@ class CreationAlternative:
         Transforms name to HEC DSSVue nomenclature (10 characters)
 
         """
-        name = None
-
-        if type_series == 'STO':
-            name = "M" + "{:09d}".format(int(float(dss_name)))
-        return name
+        return _alternative_name(dss_name, type_series)
 
     def create_config_from(self,
                            config_file) -> str:
@@ -465,3 +456,11 @@ class CreationAlternative:
                              mod_time=mod_time)
 
 
+@lru_cache(maxsize=1024)
+def _alternative_name(dss_name, type_series):
+    """Cached formatter behind CreationAlternative.get_alternative_name (called twice per alternative)."""
+    name = None
+
+    if type_series == 'STO':
+        name = "M" + "{:09d}".format(int(float(dss_name)))
+    return name
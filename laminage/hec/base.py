@@ -1,16 +1,17 @@
 import os
 import errno
 import dask
-from shutil import copytree
 from dask import compute, persist, delayed
 from dask.distributed import Client, progress
 import numpy as np
 import glob
+from itertools import islice
+from functools import lru_cache
 import shutil
-from distutils.dir_util import copy_tree
 import subprocess
-from pathlib import Path
-from send2trash import send2trash
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PureWindowsPath
 import pandas as pd
 from pydsstools.heclib.dss import HecDss
 from pydsstools.core import PairedDataContainer
@@ -19,10 +20,14 @@ import hvplot.pandas
 
 from .alternatives import CreationAlternative as ca
 from .simulations import _read_dss_values, _save_simulation_values
-from .csvtodss import _csv_to_dss
+from .csvtodss import _csv_to_dss_batch
+from .fileutils import _fast_copy, _clone_template
 from .verifications import *
 from .alternatives import CreationAlternative
 
+# removes finished chunk bases without blocking the dask task
+_CLEANUP_POOL = ThreadPoolExecutor(max_workers=2)
+
 
 class BaseManager:
     """
@@ -35,6 +40,8 @@ class BaseManager:
         Complete or relative path model base
     project_path : str, default None
         Project directory
+    link_template : bool, default False
+        Hard-link read-only files of the model base into each chunk base instead of copying them
 
     Examples
         --------
@@ -86,7 +93,8 @@ class BaseManager:
     def __init__(self,
                  project_path: str,
                  model_base_folder: str,
-                 routing_config: dict = None
+                 routing_config: dict = None,
+                 link_template: bool = False
                  ):
         """
 
@@ -96,19 +104,27 @@ class BaseManager:
             Complete or relative path model base
         project_path : str, default None
             Project directory
+        link_template : bool, default False
+            Hard-link files outside the rss, shared and study folders (and outside the watershed
+            folder itself) into each chunk base instead of copying them. Only enable it if HEC ResSim
+            is known not to write those files in place : any such write alters the model base itself.
 
         """
 
-        if not os.path.isdir(project_path):
-            try:
-                os.makedirs(project_path)
-            except OSError as e:
-                if e.errno != errno.EEXIST:
-                    raise
+        os.makedirs(project_path, exist_ok=True)
         self.project_path: str = project_path
+        self._programs_dir: str = os.path.join(project_path, '02_Calculs', '01_Programmes')
+        self._bases_dir: str = os.path.join(project_path, '02_Calculs', 'Laminage_STO', '02_Bases')
+        self._results_dir: str = os.path.join(project_path, '02_Calculs', 'Laminage_STO', '03_Resultats')
+        self._dss_dir: str = os.path.join(project_path, '01_Intrants', 'Series_stochastiques', 'dss')
 
         verify_base_folder_exist(model_base_folder)
         self.model_base_folder: str = model_base_folder
+        self.link_template: bool = link_template
+        self._study_rel: str = _find_study_once(model_base_folder)
+        if self._study_rel is None:
+            raise FileNotFoundError('"study" not found in provided path : {}. '
+                                    'Please change your input to an appropriate base'.format(model_base_folder))
 
         _routing_config = {}
 
@@ -140,7 +156,8 @@ class BaseManager:
                    csv_directory: str,
                    client,
                    dss_directory: str = None,
-                   limit_nb_csv: int = None):
+                   limit_nb_csv: int = None,
+                   batch_size: int = 50):
         """
         Convert all csv files in directory to dss files using the dask distributed client for parallel processing
 
@@ -153,6 +170,8 @@ class BaseManager:
         dss_directory : str
             Folder where all .dss alternatives files are held
         limit_nb_csv : float
+        batch_size : int, default 50
+            Number of csv files converted by each task (keeps the task graph small)
 
         Returns
         -------
@@ -162,19 +181,19 @@ class BaseManager:
         if dss_directory is None:
             dss_directory = os.path.join(os.path.dirname(os.path.dirname(csv_directory)),
                                          'dss')
-        if not os.path.isdir(dss_directory):
-            try:
-                os.makedirs(dss_directory)
-            except OSError as e:
-                if e.errno != errno.EEXIST:
-                    raise
-
-        lazy_results = [dask.delayed(_csv_to_dss)(csv_filename=filename,
-                                                  output_path=dss_directory,
-                                                  start_date=self.routing_config['lookup_date'])
-                        for filename in sorted(glob.glob(csv_directory))[:limit_nb_csv]]
+        os.makedirs(dss_directory, exist_ok=True)
+
+        csv_filenames = glob.iglob(csv_directory)
+        if limit_nb_csv is not None:
+            csv_filenames = sorted(csv_filenames)[:limit_nb_csv]
+
         print('Dss files stored in path : {}'.format(dss_directory))
-        return client.compute(lazy_results)
+        return [client.submit(_csv_to_dss_batch,
+                              csv_filenames=batch,
+                              output_path=dss_directory,
+                              start_date=self.routing_config['lookup_date'],
+                              pure=False)
+                for batch in chunks(csv_filenames, batch_size)]
 
     def create_alternatives(self,
                             dss_filename_list):
@@ -183,6 +202,12 @@ class BaseManager:
         """
         rss_directory = directory_find('rss', root=os.path.dirname(os.path.dirname(dss_filename_list[0])))
 
+        # identical for every alternative : compute once
+        connectivity_table = self.create_connectivity_table(self.routing_config['dss_capacity_filename'],
+                                                            self.routing_config['rsys_filename'])
+        initial_conditions = pd.DataFrame(self.routing_config['level_init_conditions'].items(),
+                                          columns=['name', 'value'])
+
         for idx, alt_filename in enumerate(dss_filename_list):
             alt = CreationAlternative(dss_filename=alt_filename,
                                       output_path=rss_directory,
@@ -194,10 +219,8 @@ class BaseManager:
             if idx == 0:
                 alt.create_config_from(self.routing_config['source_config_file'])
 
-            alt.add_alternative(dataframe=self.create_connectivity_table(self.routing_config['dss_capacity_filename'],
-                                                                         self.routing_config['rsys_filename']),
-                                dataframe_initial_conditions=pd.DataFrame(self.routing_config['level_init_conditions']
-                                                                          .items(), columns=['name', 'value']))
+            alt.add_alternative(dataframe=connectivity_table,
+                                dataframe_initial_conditions=initial_conditions)
 
     def update_storage(self,
                        client,
@@ -465,6 +488,14 @@ class BaseManager:
         df.columns = ['line_number', 'name', 'object_parent_id', 'object_id', 'type']
         return df
 
+    @staticmethod
+    def _list_dss(dss_path):
+        """
+        Sorted list of .dss files in dss_path, cached until the directory is modified
+
+        """
+        return _scan_dss(dss_path, os.stat(dss_path).st_mtime_ns)
+
     def run_partial_base(self,
                          dss_list: list,
                          output_path: str,
@@ -497,34 +528,30 @@ class BaseManager:
             Directory to store csv results in
 
         """
-        if not os.path.isdir(output_path):
-            try:
-                os.makedirs(output_path)
-            except OSError as e:
-                if e.errno != errno.EEXIST:
-                    raise
+        os.makedirs(output_path, exist_ok=True)
 
         if csv_output_path is None:
-            csv_output_path = os.path.join(self.project_path,
-                                           '02_Calculs',
-                                           'Laminage_STO',
-                                           '03_Resultats')
+            csv_output_path = self._results_dir
+
+        _clone_template(self.model_base_folder, output_path,
+                        emptied_dir=os.path.join(self.model_base_folder, self._study_rel, 'shared'),
+                        link_readonly=self.link_template)
 
-        copytree(self.model_base_folder,
-                 output_path,
-                 dirs_exist_ok=True)
+        complete_output_path = os.path.realpath(os.path.join(output_path, self._study_rel))
 
-        result = list(Path(output_path).rglob("study"))
-        complete_output_path = os.path.realpath(str(result[0]).split('study')[0])
+        # the template .dss files of shared are left out by _clone_template
+        shared_path = os.path.join(complete_output_path, 'shared')
 
-        [os.remove(f) for f in glob.glob(os.path.join(complete_output_path, 'shared', '*.dss'))]
+        # parse file names once, reused for the copies and the alternative names
+        dss_basenames = [os.path.basename(dss_filename) for dss_filename in dss_list]
 
         # Add .dss files to shared
-        [shutil.copy2(dss_filename, os.path.join(complete_output_path, 'shared', os.path.basename(dss_filename)))
-         for dss_filename in dss_list]
+        shared_dss_list = [os.path.join(shared_path, basename) for basename in dss_basenames]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(_fast_copy, dss_list, shared_dss_list))
 
         # Create alternatives
-        self.create_alternatives(glob.glob(os.path.join(complete_output_path, 'shared','*.dss')))
+        self.create_alternatives(shared_dss_list)
 
         # Pass alternatives list to compute
         with open(os.path.join(complete_output_path,
@@ -536,15 +563,14 @@ class BaseManager:
             print(self.routing_config['end_date'], file=text_file)
 
             alternative_list = [CreationAlternative.get_alternative_name(
-                dss_name=os.path.splitext(os.path.basename(dss_filename))[0],
+                dss_name=basename.rpartition('.')[0],
                 type_series=self.routing_config['type_series'])
-                for dss_filename in dss_list]
+                for basename in dss_basenames]
             for i, line in enumerate(alternative_list):
                 print(line, file=text_file)
 
         # Run all alternatives in simulation for specific base
-        output_path_windows = ('C:' + complete_output_path.split('drive_c')[1]).replace('/', '\\\\')
-        self._run_sim(output_path_windows)
+        self._run_sim(_to_wine_win_path(complete_output_path))
 
         _save_simulation_values(alternative_names=alternative_list,
                                 variable_type_list=self.routing_config['variable_type_list'],
@@ -554,8 +580,10 @@ class BaseManager:
                                 start_date=self.routing_config['start_date'],
                                 end_date=self.routing_config['end_date'])
 
-        send2trash(output_path)
-        os.system('rm -rf ~/.local/share/Trash/*')
+        # free the chunk path right away and let the deletion of its many small files run in the background
+        trash_path = '{}.trash.{}'.format(os.path.normpath(output_path), uuid.uuid4().hex)
+        os.rename(output_path, trash_path)
+        _CLEANUP_POOL.submit(shutil.rmtree, trash_path, ignore_errors=True)
 
     def _run_sim(self,
                  base_path: str,
@@ -582,14 +610,11 @@ class BaseManager:
             print('HEC-ResSim.exe not found automatically. Please provide the hec_res_sim_path argument')
         else:
             shutil.copy2(os.path.join(os.path.dirname(__file__), 'templates', 'run_sim.py'),
-                         os.path.join(self.project_path, '02_Calculs', '01_Programmes'))
+                         self._programs_dir)
 
-            script_path = ('C:' + os.path.join(self.project_path, '02_Calculs',
-                                               '01_Programmes', 'run_sim.py').split('drive_c')[1]).replace('/', '\\\\')
+            script_path = _to_wine_win_path(os.path.join(self._programs_dir, 'run_sim.py'))
 
-            command = "wine '%s' %s %s" % (hec_res_sim_exe_path, script_path, base_path)
-
-            subprocess.call(command, shell=True)
+            subprocess.run(['wine', hec_res_sim_exe_path, script_path, base_path], check=True)
 
     def run_distributed_simulations(self,
                                     client,
@@ -633,123 +658,83 @@ class BaseManager:
         List of Futures
         """
         if output_path is None:
-            output_path = os.path.join(self.project_path,
-                                       '02_Calculs',
-                                       'Laminage_STO',
-                                       '02_Bases')
-            if not os.path.isdir(output_path):
-                try:
-                    os.makedirs(output_path)
-                except OSError as e:
-                    if e.errno != errno.EEXIST:
-                        raise
+            output_path = self._bases_dir
+            os.makedirs(output_path, exist_ok=True)
 
         # if dss_path is None:
         #     dss_path = os.path.join(self.project_path,
         #                             '01_Intrants',
         #                             'Series_stochastiques',
         #                             'dss')
-        if not os.path.isdir(dss_path):
-            try:
-                os.makedirs(dss_path)
-            except OSError as e:
-                if e.errno != errno.EEXIST:
-                    raise
+        os.makedirs(dss_path, exist_ok=True)
 
         if csv_output_path is None:
-            csv_output_path = os.path.join(self.project_path,
-                                           '02_Calculs',
-                                           'Laminage_STO',
-                                           '03_Resultats')
-        if not os.path.isdir(csv_output_path):
-            try:
-                os.makedirs(csv_output_path)
-            except OSError as e:
-                if e.errno != errno.EEXIST:
-                    raise
-
-        dss_list = sorted(glob.glob(os.path.join(dss_path, '*.dss')))
-
-        lazy_results = [dask.delayed(self.run_partial_base)(chunk,
-                                                            os.path.join(output_path,
-                                                                         "b{:06d}".format(idx + 1)),
-                                                            csv_output_path)
-                        for idx, chunk in enumerate(chunks(dss_list, n))]
+            csv_output_path = self._results_dir
+        os.makedirs(csv_output_path, exist_ok=True)
 
-        return client.compute(lazy_results)
+        # bases left by killed workers or failed background deletions of previous runs
+        _sweep_trash(output_path)
+
+        dss_list = self._list_dss(dss_path)
+
+        # submit chunks one at a time so workers can start before the whole list is chunked
+        return [client.submit(self.run_partial_base,
+                              chunk,
+                              os.path.join(output_path, "b{:06d}".format(idx + 1)),
+                              csv_output_path,
+                              pure=False)
+                for idx, chunk in enumerate(chunks(dss_list, n))]
 
     def run_distributed_simulations_ext(self,
-                                        routing_config: dict,
                                         client,
                                         output_path: str = None,
-                                        dss_path: str = None):
+                                        dss_path: str = None,
+                                        csv_output_path: str = None):
         """
-        Creates a distributed base to scale HEC ResSim simulations using the dask distributed client
+        Creates a distributed base to scale HEC ResSim simulations using the dask distributed client,
+        simulating only the first 100 alternatives
 
         Parameters
         ----------
-        routing_config : dict
-            Dictionary should contain the following keys:
-                type_series : str
-                    Options available : FREQ (frequential analysis study),
-                                        PMF (probable maximum flood study),
-                                        HIST (historical time-series study),
-                                        STO (stochastical analysis study)
-                keys_link : dict
-                    Dictionary to link dss inflows with Hec ResSim's nomenclature
-                    Keys correspond to inflow names in Hec ResSim's model
-                    while values correspond to dss inflow names
-                source_ralt_file : str
-                    Path of a reference HEC ResSim model .ralt file
-                source_config_file : str
-                    Path of the reference HEC ResSim model rss.conf file
         client : Client
             Dask client that owns the dask.delayed() objects
         output_path : str, default None
             Directory where to create distributed base
         dss_path : str, default None
             Directory where all .dss alternatives are held
+        csv_output_path : str
+            Directory to store csv results in
 
         Returns
         -------
         List of Futures
         """
         if output_path is None:
-            output_path = os.path.join(self.project_path,
-                                       '02_Calculs',
-                                       'Laminage_STO',
-                                       '02_Bases')
-            if not os.path.isdir(output_path):
-                try:
-                    os.makedirs(output_path)
-                except OSError as e:
-                    if e.errno != errno.EEXIST:
-                        raise
+            output_path = self._bases_dir
+            os.makedirs(output_path, exist_ok=True)
 
         if dss_path is None:
-            dss_path = os.path.join(self.project_path,
-                                    '01_Intrants',
-                                    'Series_stochastiques',
-                                    'dss')
-            if not os.path.isdir(dss_path):
-                try:
-                    os.makedirs(dss_path)
-                except OSError as e:
-                    if e.errno != errno.EEXIST:
-                        raise
+            dss_path = self._dss_dir
+            os.makedirs(dss_path, exist_ok=True)
 
-        dss_list = sorted(glob.glob(os.path.join(dss_path, '*.dss')))
+        if csv_output_path is None:
+            csv_output_path = self._results_dir
+        os.makedirs(csv_output_path, exist_ok=True)
+
+        # bases left by killed workers or failed background deletions of previous runs
+        _sweep_trash(output_path)
 
-        chunks = [dss_list[x:x + 100] for x in range(0, len(dss_list), 100)]
-        chunks = [dss_list[0:100]]
+        dss_list = self._list_dss(dss_path)
 
-        lazy_results = [dask.delayed(self.run_partial_base)(chunk,
-                                                            os.path.join(output_path,
-                                                                         "b{:06d}".format(idx + 1)),
-                                                            routing_config)
-                        for idx, chunk in enumerate(chunks)]
+        # only the first 100 alternatives are simulated
+        chunks = [dss_list[:100]]
 
-        return lazy_results
+        return [client.submit(self.run_partial_base,
+                              chunk,
+                              os.path.join(output_path, "b{:06d}".format(idx + 1)),
+                              csv_output_path,
+                              pure=False)
+                for idx, chunk in enumerate(chunks)]
 
 
 def get_line_numbers_reservoir_element(filename):
@@ -810,7 +795,40 @@ def directory_find(atom, root='.'):
             return os.path.join(path, atom)
 
 
-def chunks(lst, n):
-    """Yield successive n-sized chunks from lst."""
-    for i in range(0, len(lst), n):
-        yield lst[i:i + n]
\ No newline at end of file
+def _find_study_once(root):
+    """Relative path (from root) of the directory holding the HEC ResSim "study" entry."""
+    for path, dirs, files in os.walk(root):
+        if 'study' in dirs or 'study' in files:
+            return os.path.relpath(path, root)
+
+
+@lru_cache(maxsize=8)
+def _scan_dss(dss_path, mtime_ns):
+    """Kept at module level so the cache is not pickled along with BaseManager in every task."""
+    with os.scandir(dss_path) as it:
+        return tuple(sorted(entry.path for entry in it if entry.name.endswith('.dss')))
+
+
+def _sweep_trash(bases_dir):
+    """Schedule the deletion of every chunk base renamed to *.trash.* by run_partial_base in bases_dir."""
+    if not os.path.isdir(bases_dir):
+        return
+    with os.scandir(bases_dir) as it:
+        for entry in it:
+            if '.trash.' in entry.name and entry.is_dir(follow_symlinks=False):
+                _CLEANUP_POOL.submit(shutil.rmtree, entry.path, ignore_errors=True)
+
+
+def _to_wine_win_path(posix_path):
+    """Windows path (as seen by wine) of a file located under the wine prefix drive_c folder."""
+    return str(PureWindowsPath('C:', posix_path.split('drive_c', 1)[1]))
+
+
+def chunks(iterable, n):
+    """Yield successive n-sized chunks (lists) from any iterable."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, n))
+        if not chunk:
+            return
+        yield chunk
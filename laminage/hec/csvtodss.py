@@ -2,8 +2,10 @@ from pydsstools.heclib.dss import HecDss
 from pydsstools.core import TimeSeriesContainer, UNDEFINED
 import os
 import pandas as pd
-import errno
-import shutil
+
+# empty dss container every converted file starts from, read once
+with open(os.path.join(os.path.dirname(__file__), 'templates', 'empty.dss'), 'rb') as f:
+    _EMPTY_DSS_BYTES = f.read()
 
 
 def _csv_to_dss(csv_filename: str,
@@ -35,21 +37,14 @@ def _csv_to_dss(csv_filename: str,
     if sim_name is None:
         sim_name = os.path.splitext(os.path.basename(csv_filename))[0]
 
-    if not os.path.isdir(output_path):
-        try:
-            os.makedirs(output_path)
-        except OSError as e:
-            if e.errno != errno.EEXIST:
-                raise
+    os.makedirs(output_path, exist_ok=True)
 
     dss_filename = os.path.join(output_path,
                                 sim_name + '.dss')
 
     # copy empty.dss to dss_filename
-    shutil.copy2(os.path.join(os.path.dirname(__file__),
-                              'templates',
-                              'empty.dss'),
-                 dss_filename)
+    with open(dss_filename, 'wb') as f:
+        f.write(_EMPTY_DSS_BYTES)
 
     # Prepare time-series data
     df = pd.read_csv(csv_filename)
@@ -74,3 +69,38 @@ def _csv_to_dss(csv_filename: str,
         fid.deletePathname(tsc.pathname)
         fid.put_ts(tsc)
     fid.close()
+
+
+def _csv_to_dss_batch(csv_filenames: list,
+                      output_path: str = None,
+                      start_date: str = "01JAN2001 24:00:00"):
+    """
+    Converts a group of csv files with _csv_to_dss, as a single task.
+    A failing file does not prevent the conversion of the others : all failures
+    are reported together once the whole group has been processed
+
+    Parameters
+    ----------
+    csv_filenames : list
+        Complete or relative paths of csv filenames
+    output_path : str, default None
+        Folder directory to ouput converted hec files
+    start_date : str, default "01JAN2001 24:00:00"
+        Start date associated with first row of data in csv filenames
+    Returns
+    -------
+    None
+
+    """
+    failures = []
+    for csv_filename in csv_filenames:
+        try:
+            _csv_to_dss(csv_filename=csv_filename,
+                        output_path=output_path,
+                        start_date=start_date)
+        except Exception as e:
+            failures.append((csv_filename, e))
+
+    if failures:
+        raise RuntimeError('Conversion failed for {} csv file(s) :\n'.format(len(failures)) +
+                           '\n'.join('{} : {!r}'.format(filename, e) for filename, e in failures))
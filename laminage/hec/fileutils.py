@@ -0,0 +1,83 @@
+import os
+import errno
+import shutil
+
+
+def _fast_copy(src, dst):
+    """
+    Copy file data and metadata like shutil.copy2, using copy_file_range when available
+    (server-side copy or reflink on supporting filesystems) and falling back to shutil.copyfile
+    """
+    # never write through an existing file : it may be a hard link to the model base
+    try:
+        os.unlink(dst)
+    except FileNotFoundError:
+        pass
+    if not _copy_file_range(src, dst):
+        shutil.copyfile(src, dst)
+    shutil.copystat(src, dst)
+    return dst
+
+
+def _copy_file_range(src, dst):
+    """Copy file data with os.copy_file_range. Returns False when shutil.copyfile should be used instead."""
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    try:
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            remaining = os.fstat(fsrc.fileno()).st_size
+            total_copied = 0
+            while remaining > 0:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if copied == 0:
+                    # some filesystems return 0 instead of failing : only safe to fall back if nothing was written
+                    if total_copied == 0:
+                        return False
+                    raise OSError(errno.EIO, 'copy_file_range stopped before end of file', src)
+                total_copied += copied
+                remaining -= copied
+    except OSError as e:
+        if e.errno in (errno.EXDEV, errno.ENOTSUP, errno.EOPNOTSUPP,
+                       errno.ENOSYS, errno.EINVAL, errno.EBADF):
+            return False
+        raise
+    return True
+
+
+def _clone_template(src, dst, writable_dirs=('rss', 'shared', 'study'), emptied_dir=None,
+                    link_readonly=False, _writable=False):
+    """
+    Seed dst from the template src
+
+    Files are copied with _fast_copy. With link_readonly, files outside the directories named
+    in writable_dirs, and not sitting next to such a directory (e.g. the watershed folder itself),
+    are hard-linked to the template instead : the caller must guarantee they are never written
+    in place, or the template itself is modified.
+    The .dss files directly inside the emptied_dir path (the study shared folder) are not
+    cloned at all, since they are replaced by the chunk alternatives.
+    """
+    os.makedirs(dst, exist_ok=True)
+    with os.scandir(src) as it:
+        entries = list(it)
+    skip_dss = emptied_dir is not None and os.path.normpath(src) == os.path.normpath(emptied_dir)
+    copy_files = _writable or any(entry.name in writable_dirs and entry.is_dir() for entry in entries)
+
+    for entry in entries:
+        target = os.path.join(dst, entry.name)
+        if entry.is_dir():
+            _clone_template(entry.path, target, writable_dirs, emptied_dir, link_readonly,
+                            _writable or entry.name in writable_dirs)
+        elif skip_dss and entry.name.endswith('.dss'):
+            continue
+        elif copy_files or not link_readonly:
+            _fast_copy(entry.path, target)
+        else:
+            try:
+                os.link(entry.path, target)
+            except FileExistsError:
+                os.unlink(target)
+                os.link(entry.path, target)
+            except OSError:
+                # e.g. output path on another filesystem than the template
+                _fast_copy(entry.path, target)
+    return dst
@@ -8,19 +8,21 @@ from pydsstools.heclib.dss import HecDss
 from pydsstools.core import TimeSeriesContainer, UNDEFINED
 
 
-def _read_simulation_values(alternative_name: str,
-                            reservoir_id: str,
-                            variable_type: str,
-                            base_dir: str,
-                            start_date: str = "03JAN2001 00:00:00",
-                            end_date: str = "30DEC2001 00:00:00"):
+def _read_simulation_values_batch(alternative_name: str,
+                                  reservoir_list: list,
+                                  variable_type_list: list,
+                                  base_dir: str,
+                                  start_date: str = "03JAN2001 00:00:00",
+                                  end_date: str = "30DEC2001 00:00:00"):
     """
+    Reads simulated values of every reservoir and variable type of an alternative,
+    opening the simulation dss file only once
 
     Parameters
     ----------
     alternative_name
-    reservoir_id
-    variable_type
+    reservoir_list
+    variable_type_list
     base_dir
     start_date
     end_date
@@ -29,34 +31,30 @@ def _read_simulation_values(alternative_name: str,
     -------
 
     """
-    base_name = os.path.basename(base_dir)
     # TODO : don't hardcode, should pass simulation name
     dss_file = os.path.join(base_dir, 'base/Outaouais_long/rss/sim_batch/simulation.dss')
-    print(dss_file)
 
-    pathname = "//{}-POOL/{}//1DAY/{}/".format(reservoir_id,
-                                               variable_type,
-                                               alternative_name + '0')
-    print(pathname)
-    startDate = start_date
-    endDate = end_date
-
-    fid = HecDss.Open(dss_file)
-    ts = fid.read_ts(pathname, window=(startDate, endDate), trim_missing=True)
     start_date_num = np.datetime64('{}-{:02d}-{}'.format(start_date[5:9],
                                                          strptime(start_date[2:5], '%b').tm_mon, start_date[0:2]))
     end_date_num = np.datetime64('{}-{:02d}-{}'.format(end_date[5:9],
                                                        strptime(end_date[2:5], '%b').tm_mon, end_date[0:2]))
-    times = np.arange(start_date_num, end_date_num + np.timedelta64(1,'D'),
+    times = np.arange(start_date_num, end_date_num + np.timedelta64(1, 'D'),
                       np.timedelta64(1, 'D'), dtype='datetime64')
-    values = ts.values
-    fid.close()
-
     member_id = [int(alternative_name[1:])] * len(times)
-    d = {'date': times, 'reservoir_id': [reservoir_id] * len(times), 'member_id': member_id,
-         'variable_type': [variable_type] * len(times), 'value': values}
 
-    return pd.concat([pd.Series(v, name=k) for k, v in d.items()], axis=1)
+    dfs = []
+    with HecDss.Open(dss_file) as fid:
+        for variable_type in variable_type_list:
+            for reservoir_id in reservoir_list:
+                pathname = "//{}-POOL/{}//1DAY/{}/".format(reservoir_id,
+                                                           variable_type,
+                                                           alternative_name + '0')
+                ts = fid.read_ts(pathname, window=(start_date, end_date), trim_missing=True)
+                d = {'date': times, 'reservoir_id': [reservoir_id] * len(times), 'member_id': member_id,
+                     'variable_type': [variable_type] * len(times), 'value': ts.values}
+                dfs.append(pd.concat([pd.Series(v, name=k) for k, v in d.items()], axis=1))
+
+    return pd.concat(dfs)
 
 
 def _read_dss_values(alternative_basename: str,
@@ -140,15 +138,15 @@ def _save_simulation_values(alternative_names: list,
 
     # alternatives_chunks = [alternative_names[x:x + 10] for x in range(0, len(alternative_names), 10)]
     for alternative_chunk in chunks(sorted(alternative_names), 10):
-        df = pd.concat([_read_simulation_values(alternative_name,
-                                                reservoir_id,
-                                                variable_type,
-                                                base_dir,
-                                                start_date,
-                                                end_date)
-                        for alternative_name in alternative_chunk
-                        for variable_type in variable_type_list
-                        for reservoir_id in reservoir_list])
+        # one dss opening per alternative. Reads stay sequential : concurrent HecDss handles
+        # on the same file are not known to be safe (HEC-DSS keeps process-global state)
+        df = pd.concat([_read_simulation_values_batch(alternative_name,
+                                                      reservoir_list,
+                                                      variable_type_list,
+                                                      base_dir,
+                                                      start_date,
+                                                      end_date)
+                        for alternative_name in alternative_chunk])
         df.to_csv(os.path.join(csv_output_path, 'simulations_' + "{:07d}".format(int(df['member_id'].min()))
                                + '_' + "{:07d}".format(int(df['member_id'].max())) + '.csv'),
                   index=False)
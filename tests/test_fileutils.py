@@ -0,0 +1,110 @@
+import os
+
+import pytest
+
+from laminage.hec import fileutils
+from laminage.hec.fileutils import _clone_template, _copy_file_range, _fast_copy
+
+requires_copy_file_range = pytest.mark.skipif(not hasattr(os, 'copy_file_range'),
+                                              reason='os.copy_file_range not available')
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+@pytest.fixture
+def template(tmp_path):
+    root = tmp_path / 'model'
+    for relpath in ['base/ws/ws.wksp',
+                    'base/ws/rss/model.rsys',
+                    'base/ws/rss/sim_batch/shared/inputs.dss',
+                    'base/ws/shared/0000001.dss',
+                    'base/ws/shared/notes.txt',
+                    'base/ws/study/study.txt',
+                    'base/ws/maps/map.shp']:
+        _write(str(root / relpath), relpath)
+    return root
+
+
+@requires_copy_file_range
+def test_copy_file_range_copies_content(tmp_path):
+    src, dst = str(tmp_path / 'src'), str(tmp_path / 'dst')
+    _write(src, 'x' * 100000)
+    assert _copy_file_range(src, dst)
+    assert _read(dst) == 'x' * 100000
+
+
+@requires_copy_file_range
+def test_copy_file_range_falls_back_when_nothing_copied(tmp_path, monkeypatch):
+    src, dst = str(tmp_path / 'src'), str(tmp_path / 'dst')
+    _write(src, 'data')
+    monkeypatch.setattr(fileutils.os, 'copy_file_range', lambda *args: 0)
+    assert not _copy_file_range(src, dst)
+    _fast_copy(src, dst)
+    assert _read(dst) == 'data'
+
+
+@requires_copy_file_range
+def test_copy_file_range_raises_on_partial_copy(tmp_path, monkeypatch):
+    src, dst = str(tmp_path / 'src'), str(tmp_path / 'dst')
+    _write(src, 'data')
+    calls = []
+
+    def partial_copy(*args):
+        calls.append(args)
+        return 1 if len(calls) == 1 else 0
+
+    monkeypatch.setattr(fileutils.os, 'copy_file_range', partial_copy)
+    with pytest.raises(OSError):
+        _copy_file_range(src, dst)
+
+
+def test_fast_copy_does_not_write_through_hard_link(tmp_path):
+    src, linked, dst = str(tmp_path / 'src'), str(tmp_path / 'linked'), str(tmp_path / 'dst')
+    _write(src, 'new')
+    _write(linked, 'template')
+    os.link(linked, dst)
+    _fast_copy(src, dst)
+    assert _read(dst) == 'new'
+    assert _read(linked) == 'template'
+
+
+def test_clone_template_copies_everything_by_default(template, tmp_path):
+    dst = tmp_path / 'chunk'
+    _clone_template(str(template), str(dst))
+    for root, _, files in os.walk(str(dst)):
+        for name in files:
+            assert os.stat(os.path.join(root, name)).st_nlink == 1
+    assert _read(str(dst / 'base/ws/maps/map.shp')) == 'base/ws/maps/map.shp'
+
+
+def test_clone_template_links_read_only_files_when_enabled(template, tmp_path):
+    dst = tmp_path / 'chunk'
+    _clone_template(str(template), str(dst), link_readonly=True)
+    assert os.stat(str(dst / 'base/ws/maps/map.shp')).st_nlink == 2
+    for relpath in ['base/ws/ws.wksp', 'base/ws/rss/model.rsys', 'base/ws/study/study.txt']:
+        assert os.stat(str(dst / relpath)).st_nlink == 1
+
+
+def test_clone_template_skips_only_study_shared_dss(template, tmp_path):
+    dst = tmp_path / 'chunk'
+    _clone_template(str(template), str(dst), emptied_dir=str(template / 'base/ws/shared'))
+    assert not (dst / 'base/ws/shared/0000001.dss').exists()
+    assert (dst / 'base/ws/shared/notes.txt').exists()
+    assert (dst / 'base/ws/rss/sim_batch/shared/inputs.dss').exists()
+
+
+def test_clone_template_over_leftover_base_keeps_template_intact(template, tmp_path):
+    dst = tmp_path / 'chunk'
+    _clone_template(str(template), str(dst), link_readonly=True)
+    _clone_template(str(template), str(dst))
+    _write(str(dst / 'base/ws/maps/map.shp'), 'modified by chunk')
+    assert _read(str(template / 'base/ws/maps/map.shp')) == 'base/ws/maps/map.shp'